@@ -0,0 +1,16 @@
+"""numbaのnjitデコレータ（未インストール時は素のPython関数として動作）"""
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+    def njit(*args, **kwargs):
+        """numbaが無い環境向けのフォールバック（関数をそのまま返す）"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+
+        def decorator(func):
+            return func
+        return decorator
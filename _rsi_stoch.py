@@ -0,0 +1,175 @@
+"""RSI（ワイルダー平滑化）とストキャスティクスRSIを1パスで計算するカーネル"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from _njit import HAS_NUMBA, njit
+
+# RSIの窓内レンジがこれ未満なら横ばいとみなしSTOCH RSIをNaNにする
+# （同値の終値が続くとRSIは理論上一定だが、実装ごとに1e-14程度の誤差が出るため）
+FLAT_RANGE_TOL = 1e-9
+
+
+@njit(inline='always')
+def _rsi_stoch_kernel(close, period, smooth_k, smooth_d):
+    """終値配列からRSI・STOCH RSI K・Dを計算（算出できない期間はNaN）
+
+    RSIは最初のperiod日の単純平均を起点に、ワイルダーの再帰式
+    avg = (avg * (period - 1) + 値) / period で平滑化する。
+    RSIのローリング最小・最大値は単調キューで逐次更新する。
+    """
+    n = len(close)
+    rsi = np.full(n, np.nan)
+    stoch = np.full(n, np.nan)
+    k = np.full(n, np.nan)
+    d = np.full(n, np.nan)
+
+    # ローリング最小・最大値のインデックスを保持する単調キュー
+    min_queue = np.empty(n, dtype=np.int64)
+    max_queue = np.empty(n, dtype=np.int64)
+    min_head = min_tail = 0
+    max_head = max_tail = 0
+    last_nan = period - 1  # 直近でRSIがNaNだった位置
+
+    avg_gain = 0.0
+    avg_loss = 0.0
+
+    for i in range(1, n):
+        delta = close[i] - close[i - 1]
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+
+        # RSI（ワイルダー平滑化）
+        if i < period:
+            avg_gain += gain
+            avg_loss += loss
+            continue
+        if i == period:
+            avg_gain = (avg_gain + gain) / period
+            avg_loss = (avg_loss + loss) / period
+        else:
+            avg_gain = (avg_gain * (period - 1) + gain) / period
+            avg_loss = (avg_loss * (period - 1) + loss) / period
+
+        if avg_loss > 0:
+            rsi[i] = 100 - 100 / (1 + avg_gain / avg_loss)
+        elif avg_gain > 0:
+            rsi[i] = 100.0
+        else:
+            last_nan = i
+            continue
+
+        # 単調キューの更新（窓から外れたインデックスを先頭から除去）
+        while min_tail > min_head and rsi[min_queue[min_tail - 1]] >= rsi[i]:
+            min_tail -= 1
+        min_queue[min_tail] = i
+        min_tail += 1
+        while max_tail > max_head and rsi[max_queue[max_tail - 1]] <= rsi[i]:
+            max_tail -= 1
+        max_queue[max_tail] = i
+        max_tail += 1
+        while min_queue[min_head] <= i - period:
+            min_head += 1
+        while max_queue[max_head] <= i - period:
+            max_head += 1
+
+        # ストキャスティクス（窓内のRSIが全て揃っている場合のみ）
+        if last_nan > i - period:
+            continue
+        rsi_min = rsi[min_queue[min_head]]
+        rsi_max = rsi[max_queue[max_head]]
+        if rsi_max - rsi_min >= FLAT_RANGE_TOL:
+            stoch[i] = (rsi[i] - rsi_min) / (rsi_max - rsi_min) * 100
+
+        # スムージング（飽和域で0/100が厳密に残るよう窓ごとに合計）
+        if i >= smooth_k - 1:
+            total = 0.0
+            for j in range(smooth_k):
+                total += stoch[i - j]
+            k[i] = total / smooth_k
+        if i >= smooth_d - 1:
+            total = 0.0
+            for j in range(smooth_d):
+                total += k[i - j]
+            d[i] = total / smooth_d
+
+    return rsi, k, d
+
+
+@njit(cache=True, nogil=True)
+def rsi_stoch(close, period, smooth_k, smooth_d):
+    """任意のパラメータで計算（引数の型ごとに初回呼び出し時にコンパイル）"""
+    return _rsi_stoch_kernel(close, period, smooth_k, smooth_d)
+
+
+# C連続のfloat64配列に限定（pandasのコピーオンライトで返る読み取り専用配列も受け付ける）
+@njit(['UniTuple(float64[::1], 3)(float64[::1])',
+       "UniTuple(float64[::1], 3)(Array(float64, 1, 'C', readonly=True))"],
+      cache=True, nogil=True)
+def rsi_stoch_14(close):
+    """既定パラメータ（14, 3, 3）に特化した版（定数をループに畳み込みインポート時にコンパイル）"""
+    return _rsi_stoch_kernel(close, 14, 3, 3)
+
+
+# (period, smooth_k, smooth_d) → 特化版カーネル
+SPECIALIZED = {(14, 3, 3): rsi_stoch_14}
+
+
+def window_mean(values, window):
+    """短い窓の移動平均（窓内の値をそのまま合計するため丸め誤差が蓄積しない）"""
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        total = values[window - 1:].copy()
+        for lag in range(1, window):
+            total += values[window - 1 - lag:len(values) - lag]
+        out[window - 1:] = total / window
+    return out
+
+
+def _wilder_average(values, period, block=64):
+    """ワイルダー平滑化をNumPyで計算（values[1:period+1]の平均が起点）
+
+    再帰式 avg[t] = b * avg[t-1] + a * x[t] を区間ごとの閉形式
+    avg[s+m] = b^(m+1) * (avg[s-1] + a * Σ x[s+j] / b^(j+1)) で展開する。
+    b^-mが大きくなり過ぎないよう、区間の長さはblockで区切る。
+    """
+    n = len(values)
+    out = np.full(n, np.nan)
+    if n <= period:
+        return out
+
+    alpha = 1.0 / period
+    beta = (period - 1) / period
+    out[period] = values[1:period + 1].sum() / period
+    if beta == 0:
+        out[period + 1:] = values[period + 1:]
+        return out
+
+    powers = beta ** np.arange(1, block + 1)
+    for start in range(period + 1, n, block):
+        segment = values[start:start + block]
+        pw = powers[:len(segment)]
+        out[start:start + len(segment)] = pw * (out[start - 1] + alpha * np.cumsum(segment / pw))
+    return out
+
+
+def rsi_stoch_numpy(close, period, smooth_k, smooth_d):
+    """numbaが無い環境向けのNumPy版（rsi_stochと同じ結果を返す）"""
+    delta = np.diff(close, prepend=np.nan)
+    avg_gain = _wilder_average(np.where(delta > 0, delta, 0.0), period)
+    avg_loss = _wilder_average(np.where(delta < 0, -delta, 0.0), period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+
+        # ストキャスティクス（窓内にNaNがあればNaN）
+        stoch = np.full(len(close), np.nan)
+        if len(close) >= period:
+            windows = sliding_window_view(rsi, period)
+            rsi_min = windows.min(axis=1)
+            rsi_max = windows.max(axis=1)
+            rsi_range = rsi_max - rsi_min
+            stoch[period - 1:] = np.where(rsi_range >= FLAT_RANGE_TOL,
+                                          (rsi[period - 1:] - rsi_min) / rsi_range * 100, np.nan)
+
+    k = window_mean(stoch, smooth_k)
+    d = window_mean(k, smooth_d)
+    return rsi, k, d
@@ -0,0 +1,131 @@
+"""ステージ判定カーネル（analyze_stageの判定ロジックを全行に適用）"""
+import numpy as np
+
+from _njit import njit
+
+# ステージコード → ラベル（AdvancedElliottSentimentChecker.stagesと同じ順序）
+STAGE_LABELS = ('A', 'B', 'C', 'D', 'D-BC', 'E', 'F', 'G', 'G-SC')
+
+DEFAULT_STAGE = 2  # 判定できない場合は「調整（C）」
+WARMUP_BARS = 50   # 最初の50日はデータ不足のためスキップ
+
+
+@njit(cache=True, nogil=True)
+def classify_all(stoch_k, stoch_d, hlt, vol_spike, fg, vix, close, high):
+    """各日のステージコードと信頼度を計算（判定不能な期間は-1）
+
+    週足STOCH RSIや騰落率などの過去参照もループ内で計算し、
+    中間配列を作らずに各行を一度だけ読む。
+    """
+    n = len(close)
+    stages = np.full(n, -1, dtype=np.int8)
+    confidences = np.zeros(n)
+
+    for i in range(WARMUP_BARS, n):
+        k = stoch_k[i]
+        d = stoch_d[i]
+        h = hlt[i]
+        vs = vol_spike[i]
+        f = fg[i]
+        v = vix[i]
+
+        # 週足STOCH RSI（直近5日の平均、NaNは除外）
+        total = 0.0
+        count = 0
+        for j in range(i - 4, i + 1):
+            if not np.isnan(stoch_k[j]):
+                total += stoch_k[j]
+                count += 1
+        wk = total / count if count > 0 else np.nan
+
+        # 事前判定: A以外の条件は全てKとの比較を含むため、Kが欠損していて
+        # 週足も30以上なら9つの条件を評価せずにデフォルトのステージとする
+        if np.isnan(k) and not wk < 30:
+            stages[i] = DEFAULT_STAGE
+            confidences[i] = 0.5
+            continue
+
+        # 信頼度が最大のステージを保持（同点の場合は先に判定したステージ）
+        best = -1
+        best_conf = 0.0
+
+        # ステージA: 初動上昇（仕込みゾーン）
+        if wk < 30 and not vs:
+            conf = 0.8
+            if h < 30:
+                conf += 0.2
+            if conf > best_conf:
+                best, best_conf = 0, conf
+
+        # ステージB: 加速上昇（トレンド発生）
+        if k > 50 and k > d and h > 50 and h < 80:
+            conf = 0.7
+            if wk < k:
+                conf += 0.3
+            if conf > best_conf:
+                best, best_conf = 1, conf
+
+        # ステージC: 調整（押し目形成）
+        if k < d and h > 30 and h < 70:
+            conf = 0.7
+            if not vs:
+                conf += 0.2
+            if conf > best_conf:
+                best, best_conf = 2, conf
+
+        # ステージD・D-BC: 高値圏（K>80の帯でのみ判定）
+        if k > 80:
+            # ステージD: 過熱上昇（高値圏）
+            if f > 70 and v < 15 and vs:
+                conf = 0.8
+                if conf > best_conf:
+                    best, best_conf = 3, conf
+
+            # ステージD-BC: バイイングクライマックス
+            if k > 90 and f >= 85 and vs:
+                conf = 0.9
+                if close[i] < high[i] * 0.98:
+                    conf += 0.1
+                if conf > best_conf:
+                    best, best_conf = 4, conf
+
+        # ステージE: 調整A波（急落開始）
+        if k < 50 and d > k and f < 50:
+            conf = 0.7
+            if close[i] / close[i - 5] - 1 < -0.05:
+                conf += 0.3
+            if conf > best_conf:
+                best, best_conf = 5, conf
+
+        # ステージF: 戻りB波（ブルトラップ）
+        if 40 < f < 60 and not vs and 30 < k < 70:
+            conf = 0.6
+            if close[i] / close[i - 3] - 1 > 0.03:
+                conf += 0.2
+            if conf > best_conf:
+                best, best_conf = 6, conf
+
+        # ステージG・G-SC: 安値圏（K<30の帯でのみ判定）
+        if k < 30:
+            # ステージG: 本格下落C波
+            if f < 30 and v > 20:
+                conf = 0.8
+                if conf > best_conf:
+                    best, best_conf = 7, conf
+
+            # ステージG-SC: セリングクライマックス
+            if k < 20 and f <= 10 and v > 30:
+                conf = 0.9
+                if vs:
+                    conf += 0.1
+                if conf > best_conf:
+                    best, best_conf = 8, conf
+
+        if best < 0:
+            stages[i] = DEFAULT_STAGE
+            confidences[i] = 0.5
+        else:
+            stages[i] = best
+            confidences[i] = best_conf
+
+    return stages, confidences
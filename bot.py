@@ -1,5 +1,6 @@
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
 from typing import Dict, Tuple, Optional, List
@@ -7,14 +8,130 @@ import yfinance as yf
 from datetime import datetime, timedelta
 import seaborn as sns
 import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import bottleneck as bn
+except ImportError:
+    bn = None
+
+try:
+    import talib
+except ImportError:
+    talib = None
+
+from _njit import HAS_NUMBA
+from _rsi_stoch import (FLAT_RANGE_TOL, SPECIALIZED as RSI_STOCH_SPECIALIZED, rsi_stoch,
+                        rsi_stoch_numpy, window_mean)
+from _stage_classify import STAGE_LABELS, classify_all
+
 warnings.filterwarnings('ignore')
 
 # 日本語フォントの設定
 
 plt.rcParams['font.sans-serif'] = ['DejaVu Sans']
 
+
+# 詳細レポートのテンプレート（{...}_lines / sma_lineは省略可能な行のまとまり）
+REPORT_TMPL = """\
+{rule}
+エリオット波動センチメント分析 詳細レポート
+{rule}
+分析日時: {now}
+
+【現在のステージ】
+{stage_lines}
+【主要指標の現在値】
+  STOCH RSI (K/D): {stoch_k:.1f} / {stoch_d:.1f}
+  HLT: {hlt:.1f}
+  RSI: {rsi:.1f}
+  Fear & Greed: {fear_greed:.0f}
+  VIX: {vix:.1f}
+  出来高スパイク: {volume_spike}
+
+【トレンド分析】
+  5日間変化率: {change_5d:+.2f}%
+  20日間変化率: {change_20d:+.2f}%
+{sma_line}
+{warning_lines}【推奨アクション】
+{action_lines}
+{rule}"""
+
+# ステージごとの推奨アクション
+STAGE_ACTIONS = {
+    'A': [
+        '✅ 段階的な買い増し検討',
+        '📊 週足STOCH RSIの底打ち確認',
+        '💡 リスク管理: ポジションサイズは控えめに'
+    ],
+    'B': [
+        '🚀 トレンドフォローで積極買い',
+        '📈 押し目での買い増し',
+        '💡 利益確定ラインの設定'
+    ],
+    'C': [
+        '⏸️ 新規買いは控えめに',
+        '📊 HLT 30-50での押し目買い検討',
+        '💡 既存ポジションは維持'
+    ],
+    'D': [
+        '⚠️ 段階的な利益確定開始',
+        '📊 出来高とFGを注視',
+        '💡 トレーリングストップの活用'
+    ],
+    'D-BC': [
+        '🚨 即座に大部分を利益確定',
+        '📊 上ヒゲ・出来高急増を確認',
+        '💡 逆張りショートの検討も可'
+    ],
+    'E': [
+        '🔻 ロングポジション手仕舞い',
+        '📊 戻り高値でのショート検討',
+        '💡 現金比率を高める'
+    ],
+    'F': [
+        '⚠️ 戻り売りのチャンス',
+        '📊 上値の重さを確認',
+        '💡 ブルトラップに注意'
+    ],
+    'G': [
+        '🔻 ショートまたは現金保有',
+        '📊 セリクラサインを待つ',
+        '💡 逆張り買いは時期尚早'
+    ],
+    'G-SC': [
+        '✅ 段階的な買い開始',
+        '📊 出来高急増・VIX急騰を確認',
+        '💡 中長期投資のチャンス'
+    ]
+}
+
+
+# calculate_all_indicatorsが追加する指標列
+INDICATOR_COLUMNS = ['stoch_rsi_k', 'stoch_rsi_d', 'hlt', 'volume_spike', 'sma_20', 'sma_50', 'rsi']
+
+
+def _roll_reduce(values: np.ndarray, window: int, op: str) -> np.ndarray:
+    """移動窓の集計（op: 'mean' / 'max' / 'min'、窓が揃わない期間はNaN）"""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < window:
+        # bottleneckは窓より短い系列でValueErrorになるため先に全NaNを返す
+        return np.full(len(values), np.nan)
+    if bn is not None:
+        return getattr(bn, f'move_{op}')(values, window, min_count=window)
+
+    # bottleneckが無い場合はゼロコピーの窓ビューをNumPyで集計
+    out = np.full(len(values), np.nan)
+    out[window - 1:] = getattr(np, op)(sliding_window_view(values, window), axis=1)
+    return out
+
+
 class AdvancedElliottSentimentChecker:
     """エリオット波動理論に基づく高度なセンチメントチェッカー"""
+    # ステージの並び（stage列のカテゴリコードの順序）
+    STAGE_ORDER = STAGE_LABELS
+    STAGE_IDX = {stage: code for code, stage in enumerate(STAGE_ORDER)}
+
     def __init__(self):
         self.stages = {
             'A': {'name': '初動上昇（1波）', 'color': 'lightblue', 'risk': 'low'},
@@ -28,54 +145,87 @@ class AdvancedElliottSentimentChecker:
             'G-SC': {'name': 'セリングクライマックス', 'color': 'darkblue', 'risk': 'opportunity'}
         }
 
+        # ステージコードで直接引ける属性ごとの配列（STAGE_ORDERの順）
+        self._names = [self.stages[stage]['name'] for stage in self.STAGE_ORDER]
+        self._colors = np.array([self.stages[stage]['color'] for stage in self.STAGE_ORDER])
+        self._risks = [self.stages[stage]['risk'] for stage in self.STAGE_ORDER]
+
     def fetch_market_data(self, symbol: str, period: str = "6mo") -> pd.DataFrame:
         """Yahoo Financeから市場データを取得"""
-        try:
-            ticker = yf.Ticker(symbol)
-            data = ticker.history(period=period)
+        return self.fetch_many([symbol], period).get(symbol)
 
-            # VIXデータの取得（^VIX）
-            if symbol.upper() != '^VIX':
-                vix = yf.Ticker('^VIX').history(period=period)['Close']
+    def fetch_many(self, symbols: List[str], period: str = "6mo") -> Dict[str, pd.DataFrame]:
+        """複数銘柄の市場データを1回のリクエストでまとめて取得"""
+        try:
+            # VIXデータ（^VIX）も同じリクエストで取得
+            # yfinanceは大文字化したティッカーで列を返すため、取得・参照は大文字で行う
+            tickers = list(dict.fromkeys([symbol.upper() for symbol in symbols] + ['^VIX']))
+            raw = yf.download(tickers, period=period, group_by='ticker',
+                              auto_adjust=True, threads=True, progress=False)
+            vix = raw['^VIX']['Close'].dropna()
+        except Exception as e:
+            print(f"データ取得エラー: {e}")
+            return {}
+
+        results = {}
+        for symbol in symbols:
+            # 1銘柄の失敗で他の銘柄の結果を捨てないよう銘柄ごとに処理
+            try:
+                # 分析に使うOHLCVのみを残す
+                data = raw[symbol.upper()][['Open', 'High', 'Low', 'Close', 'Volume']].dropna(how='all')
+                if data.empty:
+                    print(f"データ取得エラー: {symbol}のデータがありません")
+                    continue
+
+                # 取得済みのVIXを各銘柄の日付に合わせて共有
                 data['vix'] = vix.reindex(data.index, method='ffill')
-            else:
-                data['vix'] = data['Close']
 
-            # Fear & Greedインデックスの簡易計算
-            # （実際のF&Gは複雑な計算ですが、ここでは簡易版）
-            data['fear_greed'] = self._calculate_fear_greed(data)
+                # Fear & Greedインデックスの簡易計算
+                # （実際のF&Gは複雑な計算ですが、ここでは簡易版）
+                data['fear_greed'] = self._calculate_fear_greed(data)
 
-            return data
-        except Exception as e:
-            print(f"データ取得エラー: {e}")
-            return None
+                results[symbol] = data
+            except Exception as e:
+                print(f"データ取得エラー: {symbol}: {e}")
+
+        return results
 
     def _calculate_fear_greed(self, data: pd.DataFrame) -> pd.Series:
         """Fear & Greedインデックスの簡易計算"""
         # 複数の要素を組み合わせて計算
         # 1. 価格モメンタム（20日リターン）
-        momentum = data['Close'].pct_change(20).fillna(0)
+        close = data['Close'].values.astype(np.float64)
+        momentum = np.zeros_like(close)
+        momentum[20:] = close[20:] / close[:-20] - 1
         momentum_score = (momentum + 0.1) / 0.2 * 100  # -10%～+10%を0～100にマッピング
 
         # 2. ボラティリティ（VIXの逆数）
         if 'vix' in data.columns:
-            vix_score = 100 - (data['vix'] - 10) / 30 * 100  # VIX 10-40を100-0にマッピング
+            vix = data['vix'].values.astype(np.float64)
+            vix_score = 100 - (vix - 10) / 30 * 100  # VIX 10-40を100-0にマッピング
         else:
             vix_score = 50
 
         # 3. 出来高
-        vol_ma = data['Volume'].rolling(20).mean()
-        vol_score = (data['Volume'] / vol_ma - 0.5) / 1 * 100  # 0.5x-1.5xを0-100にマッピング
+        volume = data['Volume'].values.astype(np.float64)
+        vol_ma = _roll_reduce(volume, 20, 'mean')
+        vol_score = (volume / vol_ma - 0.5) / 1 * 100  # 0.5x-1.5xを0-100にマッピング
 
         # 総合スコア
-        fg = (momentum_score * 0.4 + vix_score * 0.4 + vol_score * 0.2).clip(0, 100)
+        fg = np.clip(momentum_score * 0.4 + vix_score * 0.4 + vol_score * 0.2, 0, 100)
+
+        return pd.Series(fg, index=data.index)
 
-        return fg
+    def _last_pct_change(self, close: np.ndarray, periods: int) -> float:
+        """最新のN日間変化率（データ不足の場合はNaN）"""
+        if len(close) <= periods:
+            return np.nan
+        return close[-1] / close[-1 - periods] - 1
 
     def calculate_all_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
         """全ての指標を計算してデータフレームに追加"""
-        # STOCH RSI
-        k, d = self.calculate_stoch_rsi(data['Close'])
+        # STOCH RSI・RSI（RSIを共有して1パスで計算）
+        rsi, k, d = self._rsi_stoch(data['Close'])
         data['stoch_rsi_k'] = k
         data['stoch_rsi_d'] = d
 
@@ -86,80 +236,103 @@ class AdvancedElliottSentimentChecker:
         data['volume_spike'] = self.detect_volume_spike(data['Volume'])
 
         # 移動平均
-        data['sma_20'] = data['Close'].rolling(20).mean()
-        data['sma_50'] = data['Close'].rolling(50).mean()
+        data['sma_20'] = _roll_reduce(data['Close'].values, 20, 'mean')
+        data['sma_50'] = _roll_reduce(data['Close'].values, 50, 'mean')
 
         # RSI
-        data['rsi'] = self.calculate_rsi(data['Close'])
+        data['rsi'] = rsi
+
+        # 判定は閾値比較のみのため、価格・指標列はfloat32で保持してメモリを半減
+        for column in ['Open', 'High', 'Low', 'Close', 'Volume', 'vix', 'fear_greed',
+                       'stoch_rsi_k', 'stoch_rsi_d', 'hlt', 'sma_20', 'sma_50', 'rsi']:
+            if column in data.columns:
+                data[column] = data[column].astype(np.float32, copy=False)
+
+        # 計算済みの印として最終行のラベルを記録（スライスにも引き継がれるため、
+        # 利用時は指標列の有無とこのラベル以降に行が追加されていないかも確認する）
+        data.attrs['indicators_cached'] = data.index[-1] if len(data) else None
 
         return data
 
+    def _ensure_indicators(self, data: pd.DataFrame) -> pd.DataFrame:
+        """指標が未計算の場合のみ計算（計算済みならそのまま返す）"""
+        cached_end = data.attrs.get('indicators_cached')
+        if (cached_end is not None and len(data)
+                and all(column in data.columns for column in INDICATOR_COLUMNS)
+                and data.index[-1] <= cached_end):
+            return data
+        return self.calculate_all_indicators(data)
+
     def calculate_stoch_rsi(self, prices: pd.Series, period: int = 14,
-                           smooth_k: int = 3, smooth_d: int = 3) -> Tuple[pd.Series, pd.Series]:
+                           smooth_k: int = 3, smooth_d: int = 3) -> Tuple[np.ndarray, np.ndarray]:
         """ストキャスティクスRSIを計算"""
-        # RSI計算
-        delta = prices.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs))
-
-        # ストキャスティクス計算
-        rsi_min = rsi.rolling(window=period).min()
-        rsi_max = rsi.rolling(window=period).max()
-        stoch_rsi = (rsi - rsi_min) / (rsi_max - rsi_min) * 100
-
-        # スムージング
-        k = stoch_rsi.rolling(window=smooth_k).mean()
-        d = k.rolling(window=smooth_d).mean()
-
+        _, k, d = self._rsi_stoch(prices, period, smooth_k, smooth_d)
         return k, d
 
+    def _rsi_stoch(self, prices: pd.Series, period: int = 14, smooth_k: int = 3,
+                   smooth_d: int = 3) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """RSI・STOCH RSI K・Dをまとめて計算（TA-Libがあればそれを使用）"""
+        close = prices.values.astype(np.float64)
+        if talib is None:
+            # numbaが無い場合はPythonループではなくNumPy版で計算
+            if not HAS_NUMBA:
+                return rsi_stoch_numpy(close, period, smooth_k, smooth_d)
+            specialized = RSI_STOCH_SPECIALIZED.get((period, smooth_k, smooth_d))
+            if specialized is not None:
+                return specialized(close)
+            return rsi_stoch(close, period, smooth_k, smooth_d)
+
+        # TA-LibのSMAは累積和のため、スムージングは窓ごとの合計で行う
+        rsi = talib.RSI(close, timeperiod=period)
+        rsi_min = talib.MIN(rsi, timeperiod=period)
+        rsi_max = talib.MAX(rsi, timeperiod=period)
+        rsi_range = rsi_max - rsi_min
+        with np.errstate(divide='ignore', invalid='ignore'):
+            stoch_rsi = np.where(rsi_range >= FLAT_RANGE_TOL,
+                                 (rsi - rsi_min) / rsi_range * 100, np.nan)
+        k = window_mean(stoch_rsi, smooth_k)
+        d = window_mean(k, smooth_d)
+        return rsi, k, d
+
     def calculate_hlt(self, high: pd.Series, low: pd.Series,
-                     close: pd.Series, period: int = 20) -> pd.Series:
+                     close: pd.Series, period: int = 20) -> np.ndarray:
         """ハイローターゲット（HLT）を計算"""
-        hh = high.rolling(window=period).max()
-        ll = low.rolling(window=period).min()
-        hlt = (close - ll) / (hh - ll) * 100
+        hh = _roll_reduce(high.values, period, 'max')
+        ll = _roll_reduce(low.values, period, 'min')
+        hlt = (close.values - ll) / (hh - ll) * 100
         return hlt
 
-    def calculate_rsi(self, prices: pd.Series, period: int = 14) -> pd.Series:
-        """RSIを計算"""
-        delta = prices.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs))
-        return rsi
-
-    def detect_volume_spike(self, volume: pd.Series, threshold: float = 2.0) -> pd.Series:
-        """出来高スパイクを検出"""
-        vol_ma = volume.rolling(window=20).mean()
-        vol_spike = volume > (vol_ma * threshold)
+    def calculate_rsi(self, prices: pd.Series, period: int = 14) -> np.ndarray:
+        """RSIを計算（ワイルダー平滑化、TA-Libの有無は_rsi_stochで切り替え）"""
+        return self._rsi_stoch(prices, period)[0]
+
+    def detect_volume_spike(self, volume: pd.Series, threshold: float = 2.0) -> np.ndarray:
+        """出来高スパイクを検出（np.bool_配列、移動平均が揃わない最初の19日はFalse）"""
+        volume = volume.values.astype(np.float64)
+        vol_spike = np.zeros(len(volume), dtype=np.bool_)
+        if len(volume) >= 20:
+            vol_ma = _roll_reduce(volume, 20, 'mean')
+            vol_spike[19:] = volume[19:] > vol_ma[19:] * threshold
         return vol_spike
 
     def analyze_stage_history(self, data: pd.DataFrame) -> pd.DataFrame:
         """履歴データ全体のステージを分析"""
-        # 全指標を計算
-        data = self.calculate_all_indicators(data)
-
-        # 各日のステージを判定
-        stages = []
-        confidences = []
-
-        for i in range(len(data)):
-            if i < 50:  # 最初の50日はデータ不足のためスキップ
-                stages.append(None)
-                confidences.append(0)
-                continue
-
-            # その日までのデータで分析
-            current_data = data.iloc[:i+1]
-            result = self.analyze_stage(current_data)
-            stages.append(result['current_stage'])
-            confidences.append(result['confidence'])
-
-        data['stage'] = stages
+        # 全指標を計算（既に計算済みの場合はそれを使用）
+        data = self._ensure_indicators(data)
+
+        # 各日のステージを一括判定（analyze_stageと同じロジックをカーネルで全行に適用）
+        n = len(data)
+        fg = data['fear_greed'].values if 'fear_greed' in data else np.full(n, 50.0)
+        vix = data['vix'].values if 'vix' in data else np.full(n, 15.0)
+
+        codes, confidences = classify_all(
+            data['stoch_rsi_k'].values, data['stoch_rsi_d'].values,
+            data['hlt'].values, np.asarray(data['volume_spike'].values, dtype=np.bool_),
+            fg.astype(np.float64), vix.astype(np.float64),
+            data['Close'].values.astype(np.float64), data['High'].values.astype(np.float64))
+
+        # int8コードのままカテゴリ列に格納（コード-1のデータ不足期間は欠損値）
+        data['stage'] = pd.Categorical.from_codes(codes, categories=self.STAGE_ORDER)
         data['stage_confidence'] = confidences
 
         return data
@@ -175,22 +348,26 @@ class AdvancedElliottSentimentChecker:
         }
 
         # 指標の計算（既に計算済みの場合はそれを使用）
-        if 'stoch_rsi_k' not in data.columns:
-            data = self.calculate_all_indicators(data)
-
-        # 最新値を取得
-        latest_stoch_k = data['stoch_rsi_k'].iloc[-1]
-        latest_stoch_d = data['stoch_rsi_d'].iloc[-1]
-        latest_hlt = data['hlt'].iloc[-1]
-        latest_vol_spike = data['volume_spike'].iloc[-1]
-        latest_rsi = data['rsi'].iloc[-1]
-
-        # 週足STOCH RSI（簡易的に5日分を使用）
-        weekly_stoch_k = data['stoch_rsi_k'].iloc[-5:].mean() if len(data) >= 5 else latest_stoch_k
+        data = self._ensure_indicators(data)
+
+        # 最新値を取得（各列のndarrayから末尾のみを参照）
+        # float32列は判定カーネルと同じfloat64に上げてから計算し、閾値付近での食い違いを防ぐ
+        close = data['Close'].values.astype(np.float64)
+        high = data['High'].values.astype(np.float64)
+        stoch_k_tail = data['stoch_rsi_k'].values[-5:].astype(np.float64)
+        latest_stoch_k = stoch_k_tail[-1]
+        latest_stoch_d = data['stoch_rsi_d'].values[-1]
+        latest_hlt = data['hlt'].values[-1]
+        latest_vol_spike = data['volume_spike'].values[-1]
+        latest_rsi = data['rsi'].values[-1]
+
+        # 週足STOCH RSI（簡易的に5日分を使用、NaNは除外）
+        recent_stoch_k = np.nanmean(stoch_k_tail)
+        weekly_stoch_k = recent_stoch_k if len(data) >= 5 else latest_stoch_k
 
         # FGとVIXの処理
-        latest_fg = data['fear_greed'].iloc[-1] if 'fear_greed' in data else 50
-        latest_vix = data['vix'].iloc[-1] if 'vix' in data else 15
+        latest_fg = data['fear_greed'].values[-1] if 'fear_greed' in data else 50
+        latest_vix = data['vix'].values[-1] if 'vix' in data else 15
 
         results['indicators'] = {
             'stoch_rsi_k': latest_stoch_k,
@@ -203,78 +380,79 @@ class AdvancedElliottSentimentChecker:
             'rsi': latest_rsi
         }
 
-        # ステージ判定ロジック（基本実装と同じ）
-        confidence_scores = {}
+        # ステージ判定ロジック（信頼度はSTAGE_ORDERの順に並ぶ配列で保持）
+        scores = np.zeros(len(self.STAGE_ORDER))
 
         # ステージA: 初動上昇（仕込みゾーン）
         if weekly_stoch_k < 30 and not latest_vol_spike:
-            confidence_scores['A'] = 0.8
+            scores[self.STAGE_IDX['A']] = 0.8
             if latest_hlt < 30:
-                confidence_scores['A'] += 0.2
+                scores[self.STAGE_IDX['A']] += 0.2
 
         # ステージB: 加速上昇（トレンド発生）
         if (latest_stoch_k > 50 and latest_stoch_k > latest_stoch_d and
             latest_hlt > 50 and latest_hlt < 80):
-            confidence_scores['B'] = 0.7
-            if data['stoch_rsi_k'].iloc[-5:].mean() < data['stoch_rsi_k'].iloc[-1]:
-                confidence_scores['B'] += 0.3
+            scores[self.STAGE_IDX['B']] = 0.7
+            if recent_stoch_k < latest_stoch_k:
+                scores[self.STAGE_IDX['B']] += 0.3
 
         # ステージC: 調整（押し目形成）
         if (latest_stoch_k < latest_stoch_d and
             latest_hlt > 30 and latest_hlt < 70):
-            confidence_scores['C'] = 0.7
+            scores[self.STAGE_IDX['C']] = 0.7
             if not latest_vol_spike:
-                confidence_scores['C'] += 0.2
+                scores[self.STAGE_IDX['C']] += 0.2
 
         # ステージD: 過熱上昇（高値圏）
         if (latest_stoch_k > 80 and latest_fg > 70 and
             latest_vix < 15 and latest_vol_spike):
-            confidence_scores['D'] = 0.8
+            scores[self.STAGE_IDX['D']] = 0.8
 
         # ステージD-BC: バイイングクライマックス
         if (latest_fg >= 85 and latest_vol_spike and
             latest_stoch_k > 90):
-            confidence_scores['D-BC'] = 0.9
-            if data['Close'].iloc[-1] < data['High'].iloc[-1] * 0.98:
-                confidence_scores['D-BC'] += 0.1
+            scores[self.STAGE_IDX['D-BC']] = 0.9
+            if close[-1] < high[-1] * 0.98:
+                scores[self.STAGE_IDX['D-BC']] += 0.1
 
         # ステージE: 調整A波（急落開始）
         if (latest_stoch_k < 50 and latest_stoch_d > latest_stoch_k and
             latest_fg < 50):
-            confidence_scores['E'] = 0.7
-            if data['Close'].pct_change(5).iloc[-1] < -0.05:
-                confidence_scores['E'] += 0.3
+            scores[self.STAGE_IDX['E']] = 0.7
+            if self._last_pct_change(close, 5) < -0.05:
+                scores[self.STAGE_IDX['E']] += 0.3
 
         # ステージF: 戻りB波（ブルトラップ）
         if (40 < latest_fg < 60 and latest_vol_spike == False and
             30 < latest_stoch_k < 70):
-            confidence_scores['F'] = 0.6
-            if data['Close'].pct_change(3).iloc[-1] > 0.03:
-                confidence_scores['F'] += 0.2
+            scores[self.STAGE_IDX['F']] = 0.6
+            if self._last_pct_change(close, 3) > 0.03:
+                scores[self.STAGE_IDX['F']] += 0.2
 
         # ステージG: 本格下落C波
         if (latest_fg < 30 and latest_stoch_k < 30 and
             latest_vix > 20):
-            confidence_scores['G'] = 0.8
+            scores[self.STAGE_IDX['G']] = 0.8
 
         # ステージG-SC: セリングクライマックス
         if (latest_fg <= 10 and latest_vix > 30 and
             latest_stoch_k < 20):
-            confidence_scores['G-SC'] = 0.9
+            scores[self.STAGE_IDX['G-SC']] = 0.9
             if latest_vol_spike:
-                confidence_scores['G-SC'] += 0.1
-
-        # 最も可能性の高いステージを選択
-        if confidence_scores:
-            best_stage = max(confidence_scores.items(), key=lambda x: x[1])
-            results['current_stage'] = best_stage[0]
-            results['confidence'] = best_stage[1]
-            results['stage_description'] = self.stages[best_stage[0]]['name']
+                scores[self.STAGE_IDX['G-SC']] += 0.1
+
+        # 最も可能性の高いステージを選択（同点の場合は先に判定したステージ）
+        best = int(scores.argmax())
+        if scores[best] > 0:
+            best_stage = self.STAGE_ORDER[best]
+            results['current_stage'] = best_stage
+            results['confidence'] = float(scores[best])
+            results['stage_description'] = self._names[best]
         else:
             # デフォルトのステージを設定
             results['current_stage'] = 'C'  # 例えば「調整」をデフォルトに
             results['confidence'] = 0.5
-            results['stage_description'] = self.stages['C']['name']
+            results['stage_description'] = self._names[self.STAGE_IDX['C']]
             results['warnings'].append('明確なステージを判断できませんでした。デフォルトのステージを表示しています。')
 
         # 警告メッセージの追加
@@ -295,13 +473,16 @@ class AdvancedElliottSentimentChecker:
         ax1 = axes[0]
         ax1.plot(data.index, data['Close'], 'k-', linewidth=1.5, label='Close')
 
-        # ステージごとに背景色を設定
-        for stage in self.stages.keys():
-            stage_data = data[data['stage'] == stage]
-            if len(stage_data) > 0:
-                for i in range(len(stage_data)):
-                    ax1.axvspan(stage_data.index[i], stage_data.index[i] + pd.Timedelta(days=1),
-                              alpha=0.3, color=self.stages[stage]['color'])
+        # ステージが連続する区間ごとに背景色を設定（判定なしの区間はコード-1）
+        # CSVから読み直した文字列のstage列でも同じコードになるようカテゴリ化する
+        stage_codes = pd.Categorical(data['stage'], categories=self.STAGE_ORDER).codes
+        run_starts = np.flatnonzero(np.diff(stage_codes, prepend=-2))
+        run_ends = np.append(run_starts[1:], len(stage_codes))
+        for start, end in zip(run_starts, run_ends):
+            code = stage_codes[start]
+            if code >= 0:
+                ax1.axvspan(data.index[start], data.index[end - 1] + pd.Timedelta(days=1),
+                          alpha=0.3, color=self._colors[code])
 
         ax1.set_ylabel('Price', fontsize=10)
         ax1.set_title(f'{symbol} Elliott Wave Sentiment Analysis', fontsize=14, fontweight='bold')
@@ -338,7 +519,7 @@ class AdvancedElliottSentimentChecker:
 
         # 4. Volume with spikes
         ax4 = axes[3]
-        colors = ['red' if spike else 'gray' for spike in data['volume_spike']]
+        colors = np.where(data['volume_spike'].values, 'red', 'gray')
         ax4.bar(data.index, data['Volume'], color=colors, alpha=0.7, width=0.8)
         ax4.set_ylabel('Volume', fontsize=10)
         ax4.set_xlabel('Date', fontsize=10)
@@ -346,9 +527,9 @@ class AdvancedElliottSentimentChecker:
 
         # 凡例を作成
         legend_elements = []
-        for stage, info in self.stages.items():
-            legend_elements.append(mpatches.Patch(color=info['color'],
-                                                 label=f"{stage}: {info['name']}",
+        for stage, name, color in zip(self.STAGE_ORDER, self._names, self._colors):
+            legend_elements.append(mpatches.Patch(color=color,
+                                                 label=f"{stage}: {name}",
                                                  alpha=0.3))
 
         ax1.legend(handles=legend_elements, loc='upper left',
@@ -359,111 +540,50 @@ class AdvancedElliottSentimentChecker:
 
     def generate_detailed_report(self, data: pd.DataFrame, analysis_result: Dict) -> str:
         """詳細な分析レポートを生成"""
-        report = []
-        report.append("=" * 70)
-        report.append("エリオット波動センチメント分析 詳細レポート")
-        report.append("=" * 70)
-        report.append(f"分析日時: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        report.append("")
-
-        # 現在のステージ
-        report.append(f"【現在のステージ】")
         stage = analysis_result['current_stage']
-        if stage:
-            stage_info = self.stages[stage]
-            report.append(f"  ステージ: {stage} - {stage_info['name']}")
-            report.append(f"  信頼度: {analysis_result['confidence']*100:.1f}%")
-            report.append(f"  リスクレベル: {stage_info['risk']}")
-        report.append("")
-
-        # 主要指標
-        report.append(f"【主要指標の現在値】")
         indicators = analysis_result['indicators']
-        report.append(f"  STOCH RSI (K/D): {indicators['stoch_rsi_k']:.1f} / {indicators['stoch_rsi_d']:.1f}")
-        report.append(f"  HLT: {indicators['hlt']:.1f}")
-        report.append(f"  RSI: {indicators['rsi']:.1f}")
-        report.append(f"  Fear & Greed: {indicators['fear_greed']:.0f}")
-        report.append(f"  VIX: {indicators['vix']:.1f}")
-        report.append(f"  出来高スパイク: {'検出' if indicators['volume_spike'] else '通常'}")
-        report.append("")
-
-        # トレンド分析
-        report.append(f"【トレンド分析】")
-        price_change_5d = data['Close'].pct_change(5).iloc[-1] * 100
-        price_change_20d = data['Close'].pct_change(20).iloc[-1] * 100
-        report.append(f"  5日間変化率: {price_change_5d:+.2f}%")
-        report.append(f"  20日間変化率: {price_change_20d:+.2f}%")
+        stage_warnings = analysis_result['warnings']
 
+        # 現在のステージ
+        stage_lines = ""
+        if stage:
+            code = self.STAGE_IDX[stage]
+            stage_lines = (f"  ステージ: {stage} - {self._names[code]}\n"
+                           f"  信頼度: {analysis_result['confidence']*100:.1f}%\n"
+                           f"  リスクレベル: {self._risks[code]}\n")
+
+        # トレンド分析（analyze_stageと同じくfloat64で計算）
+        close = data['Close'].values.astype(np.float64)
+        sma_line = ""
         if 'sma_20' in data.columns and 'sma_50' in data.columns:
-            sma_trend = "上昇" if data['sma_20'].iloc[-1] > data['sma_50'].iloc[-1] else "下降"
-            report.append(f"  移動平均トレンド: {sma_trend}")
-        report.append("")
+            sma_trend = "上昇" if data['sma_20'].values[-1] > data['sma_50'].values[-1] else "下降"
+            sma_line = f"  移動平均トレンド: {sma_trend}\n"
 
         # 警告・アドバイス
-        if analysis_result['warnings']:
-            report.append(f"【注意事項】")
-            for warning in analysis_result['warnings']:
-                report.append(f"  {warning}")
-            report.append("")
+        warning_lines = ""
+        if stage_warnings:
+            warning_lines = "【注意事項】\n" + "".join(f"  {warning}\n" for warning in stage_warnings) + "\n"
 
         # 推奨アクション
-        report.append(f"【推奨アクション】")
-        action_map = {
-            'A': [
-                '✅ 段階的な買い増し検討',
-                '📊 週足STOCH RSIの底打ち確認',
-                '💡 リスク管理: ポジションサイズは控えめに'
-            ],
-            'B': [
-                '🚀 トレンドフォローで積極買い',
-                '📈 押し目での買い増し',
-                '💡 利益確定ラインの設定'
-            ],
-            'C': [
-                '⏸️ 新規買いは控えめに',
-                '📊 HLT 30-50での押し目買い検討',
-                '💡 既存ポジションは維持'
-            ],
-            'D': [
-                '⚠️ 段階的な利益確定開始',
-                '📊 出来高とFGを注視',
-                '💡 トレーリングストップの活用'
-            ],
-            'D-BC': [
-                '🚨 即座に大部分を利益確定',
-                '📊 上ヒゲ・出来高急増を確認',
-                '💡 逆張りショートの検討も可'
-            ],
-            'E': [
-                '🔻 ロングポジション手仕舞い',
-                '📊 戻り高値でのショート検討',
-                '💡 現金比率を高める'
-            ],
-            'F': [
-                '⚠️ 戻り売りのチャンス',
-                '📊 上値の重さを確認',
-                '💡 ブルトラップに注意'
-            ],
-            'G': [
-                '🔻 ショートまたは現金保有',
-                '📊 セリクラサインを待つ',
-                '💡 逆張り買いは時期尚早'
-            ],
-            'G-SC': [
-                '✅ 段階的な買い開始',
-                '📊 出来高急増・VIX急騰を確認',
-                '💡 中長期投資のチャンス'
-            ]
-        }
-
-        if stage in action_map:
-            for action in action_map[stage]:
-                report.append(f"  {action}")
-
-        report.append("")
-        report.append("=" * 70)
-
-        return "\n".join(report)
+        action_lines = "".join(f"  {action}\n" for action in STAGE_ACTIONS.get(stage, ()))
+
+        return REPORT_TMPL.format(
+            rule="=" * 70,
+            now=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            stage_lines=stage_lines,
+            stoch_k=indicators['stoch_rsi_k'],
+            stoch_d=indicators['stoch_rsi_d'],
+            hlt=indicators['hlt'],
+            rsi=indicators['rsi'],
+            fear_greed=indicators['fear_greed'],
+            vix=indicators['vix'],
+            volume_spike='検出' if indicators['volume_spike'] else '通常',
+            change_5d=self._last_pct_change(close, 5) * 100,
+            change_20d=self._last_pct_change(close, 20) * 100,
+            sma_line=sma_line,
+            warning_lines=warning_lines,
+            action_lines=action_lines,
+        )
 
 # 使用例とデモ
 
@@ -476,17 +596,20 @@ if __name__ == "__main__":
 
     # 実際の市場データで分析（例: S&P 500）
     symbols = {"S&P 500": "^GSPC", "NASDAQ": "^IXIC"}
-    for name, symbol in symbols.items():
-        print(f"\n{name} ({symbol})のデータを取得中...")
+    print("\n市場データを一括取得中...")
+    market_data = checker.fetch_many(list(symbols.values()), period="6mo")
 
-        # データ取得
-        data = checker.fetch_market_data(symbol, period="6mo")
+    # 全期間のステージ分析（銘柄ごとに独立しているためスレッドで並列実行）
+    print("ステージ分析を実行中...")
+    with ThreadPoolExecutor(max_workers=max(len(market_data), 1)) as executor:
+        analyzed = dict(zip(market_data.keys(),
+                            executor.map(checker.analyze_stage_history, market_data.values())))
 
-        if data is not None:
-            # 全期間のステージ分析
-            print("ステージ分析を実行中...")
-            data_with_stages = checker.analyze_stage_history(data)
+    for name, symbol in symbols.items():
+        print(f"\n{name} ({symbol})の分析")
+        data_with_stages = analyzed.get(symbol)
 
+        if data_with_stages is not None:
             # 現在のステージ分析
             current_analysis = checker.analyze_stage(data_with_stages)
 
@@ -502,7 +625,7 @@ if __name__ == "__main__":
             print("\n【ステージ遷移統計】")
             stage_counts = data_with_stages['stage'].value_counts()
             for stage, count in stage_counts.items():
-                if stage:
+                if count:
                     percentage = (count / len(data_with_stages)) * 100
                     print(f"  {stage}: {count}日 ({percentage:.1f}%)")
         else: